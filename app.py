@@ -1,10 +1,11 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import time
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from datetime import datetime
+from numba import njit
 import requests  # NEW: Required for fetching IoT data
+import orjson
 
 # --- 1. PAGE CONFIGURATION ---
 st.set_page_config(
@@ -15,7 +16,9 @@ st.set_page_config(
 )
 
 # --- 2. ADVANCED CSS STYLING ---
-st.markdown("""
+@st.cache_resource
+def css_blob():
+    return """
     <style>
     @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700&family=Rajdhani:wght@300;500;700&display=swap');
 
@@ -48,6 +51,7 @@ st.markdown("""
         box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
     }
     .hud-card.cost { border-left-color: #ffd700; }
+    .hud-grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 10px; }
     
     .metric-label {
         font-family: 'Orbitron', sans-serif; font-size: 0.7rem; color: #888;
@@ -77,13 +81,32 @@ st.markdown("""
     
     [data-testid="stSidebar"] { background-color: #080808; border-right: 1px solid #222; }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+st.markdown(css_blob(), unsafe_allow_html=True)
 
 # --- 3. SESSION STATE ---
 if 'energy' not in st.session_state:
     st.session_state.energy = 0.0
-if 'history' not in st.session_state:
-    st.session_state.history = pd.DataFrame(columns=['Time', 'Power'])
+# Ticks are browser-timed (and throttled in hidden tabs), so energy is
+# integrated over the real time elapsed between polls, not refresh_rate
+if 'last_tick' not in st.session_state:
+    st.session_state.last_tick = time.monotonic()
+# Fixed-size ring buffer for the power history (replaces a growing DataFrame).
+# Per-session footprint stays constant: 50 x (8 B time + 4 B power) = 600 B,
+# plus the 2 x 1024 float64 noise batch (16 KB) and the three cached figures.
+HISTORY_LEN = 50
+if 'buf_time' not in st.session_state:
+    st.session_state.buf_time = np.empty(HISTORY_LEN, dtype='datetime64[s]')
+    st.session_state.buf_power = np.empty(HISTORY_LEN, dtype=np.float32)
+    st.session_state.buf_idx = 0
+    st.session_state.buf_full = False
+
+# Simulator noise is drawn in batches and consumed one sample per tick
+NOISE_BATCH = 1024
+if 'rng' not in st.session_state:
+    st.session_state.rng = np.random.default_rng()
+    st.session_state.noise_idx = 0
 
 # --- 4. SIDEBAR CONFIG ---
 with st.sidebar:
@@ -107,21 +130,45 @@ with st.sidebar:
         st.info("MODE: DEMO SIMULATION")
 
 # --- 5. HELPER FUNCTIONS ---
+@st.cache_resource(ttl=24*60*60)
+def http_session():
+    # Shared keep-alive session so each poll reuses the ESP32 TCP connection
+    s = requests.Session()
+    s.headers['Connection'] = 'keep-alive'
+    return s
+
+def next_noise():
+    # Pop one (voltage, current) noise pair, refilling the batch when exhausted
+    idx = st.session_state.noise_idx
+    if idx == 0:
+        rng = st.session_state.rng
+        st.session_state.noise_v = rng.normal(0, 5, NOISE_BATCH)
+        st.session_state.noise_c = rng.normal(0, 2, NOISE_BATCH)
+    st.session_state.noise_idx = (idx + 1) % NOISE_BATCH
+    return st.session_state.noise_v[idx], st.session_state.noise_c[idx]
+
+@njit(cache=True)
+def sim_step(energy, elapsed, noise_v, noise_c):
+    # Compiled simulator math: returns (voltage, current, power, new energy kWh)
+    voltage = max(180.0, 230.0 + noise_v)
+    current = max(0.1, 5.0 + noise_c)
+    power = voltage * current * 0.92 # Assuming PF 0.92
+    return voltage, current, power, energy + (power / 1000) * (elapsed / 3600)
+
 def get_data():
     """
     Fetches data either from the random simulator OR the real ESP32 API.
     """
+    now = time.monotonic()
+    elapsed = now - st.session_state.last_tick
+    st.session_state.last_tick = now
+
     # CASE A: SIMULATION
     if data_source == "Simulation":
-        voltage = 230 + np.random.normal(0, 5)
-        current = 5 + np.random.normal(0, 2)
-        voltage = max(180, voltage) 
-        current = max(0.1, current)
-        power = voltage * current * 0.92 # Assuming PF 0.92
-        
+        noise_v, noise_c = next_noise()
+        voltage, current, power, energy = sim_step(st.session_state.energy, elapsed, noise_v, noise_c)
         # Manually increment energy for simulation
-        kwh_increment = (power / 1000) * (refresh_rate / 3600)
-        st.session_state.energy += kwh_increment
+        st.session_state.energy = energy
         
         return {
             "voltage": voltage, "current": current, "power": power, 
@@ -134,9 +181,9 @@ def get_data():
         try:
             # We expect the ESP32 to return JSON: 
             # {"voltage": 230.5, "current": 4.2, "power": 960, "energy": 120.5, "frequency": 50.0, "pf": 0.95}
-            response = requests.get(api_endpoint, timeout=2)
+            response = http_session().get(api_endpoint, timeout=2)
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 # Update session energy to match meter reading
                 st.session_state.energy = data.get('energy', 0)
                 return {
@@ -153,6 +200,18 @@ def get_data():
         except Exception as e:
             return None
 
+# Static console markup; only the volatile fields are substituted per tick
+CONSOLE_TMPL = """
+    <div class="console-box">
+        <div style="border-bottom: 1px solid #333; margin-bottom: 10px; color: #fff;">>> IOT_DIAGNOSTICS_LIVE</div>
+        <div class="console-line"><span>> SOURCE</span><span>{status}</span></div>
+        <div class="console-line"><span>> GRID_FREQ</span><span>{freq:.1f} Hz</span></div>
+        <div class="console-line"><span>> POWER_FACTOR</span><span>{pf:.2f}</span></div>
+        <div class="console-line"><span>> VOLTAGE_STATUS</span><span style="color:{v_col}">[{v_status}]</span></div>
+        <div style="color:#666; font-size:0.7rem; margin-top:10px;">> PACKET_RX: {now_str}</div>
+    </div>
+"""
+
 def get_hud_card_html(label, value, unit, is_cost=False):
     card_class = "hud-card cost" if is_cost else "hud-card"
     return f"""
@@ -165,58 +224,106 @@ def get_hud_card_html(label, value, unit, is_cost=False):
         </div>
     """
 
+def render_all_cards(voltage, current, power, cost):
+    # One HTML blob for all four cards -> one markdown update per tick
+    # (stripped so no blank lines break the markdown HTML block)
+    cards = "".join(card.strip() for card in (
+        get_hud_card_html("GRID VOLTAGE", f"{voltage:.1f}", "V"),
+        get_hud_card_html("CURRENT DRAW", f"{current:.2f}", "A"),
+        get_hud_card_html("ACTIVE POWER", f"{int(power)}", "W"),
+        get_hud_card_html("EST. COST", f"{cost:.2f}", "₹", is_cost=True),
+    ))
+    return f'<div class="hud-grid">{cards}</div>'
+
+@st.cache_data(ttl=24*60*60, max_entries=32)
+def gauge_layout(min_v, max_v, color_hex):
+    # Gauge styling depends only on range and colour; shared across sessions
+    return {
+        'axis': {'range': [min_v, max_v], 'tickwidth': 1, 'tickcolor': "#444"},
+        'bar': {'color': color_hex, 'thickness': 0.15}, 
+        'bgcolor': "rgba(0,0,0,0)",
+        'borderwidth': 0,
+        'steps': [{'range': [min_v, max_v], 'color': "#111"}],
+        'threshold': {'line': {'color': "red", 'width': 2}, 'thickness': 0.75, 'value': max_v * 0.95}
+    }
+
 def create_gauge(value, title, min_v, max_v, color_hex="#00d4ff"):
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
         value=value,
         title={'text': title, 'font': {'size': 14, 'color': '#888', 'family': "Orbitron"}}, 
         number={'font': {'color': "white", 'family': "Orbitron", 'size': 30}},
-        gauge={
-            'axis': {'range': [min_v, max_v], 'tickwidth': 1, 'tickcolor': "#444"},
-            'bar': {'color': color_hex, 'thickness': 0.15}, 
-            'bgcolor': "rgba(0,0,0,0)",
-            'borderwidth': 0,
-            'steps': [{'range': [min_v, max_v], 'color': "#111"}],
-            'threshold': {'line': {'color': "red", 'width': 2}, 'thickness': 0.75, 'value': max_v * 0.95}
-        }
+        gauge=gauge_layout(min_v, max_v, color_hex)
     ))
     fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', font={'color': "#888", 'family': "Rajdhani"},
                       margin=dict(l=30, r=30, t=40, b=20), height=200)
     return fig
 
-def create_chart(history_df):
-    df = history_df.copy()
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    try:
-        df['Datetime'] = pd.to_datetime(today_str + ' ' + df['Time'])
-    except:
-        df['Datetime'] = df['Time']
+def push_history(power):
+    # O(1) slot write into the ring buffer
+    idx = st.session_state.buf_idx
+    # Local wall-clock seconds (np.datetime64('now') would be UTC)
+    now = time.time()
+    st.session_state.buf_time[idx] = np.datetime64(int(now + time.localtime(now).tm_gmtoff), 's')
+    st.session_state.buf_power[idx] = power
+    st.session_state.buf_idx = (idx + 1) % HISTORY_LEN
+    if st.session_state.buf_idx == 0:
+        st.session_state.buf_full = True
 
+def get_history_view():
+    # Oldest -> newest (time, power) arrays, handed to Plotly as typed arrays
+    idx = st.session_state.buf_idx
+    t, p = st.session_state.buf_time, st.session_state.buf_power
+    if st.session_state.buf_full:
+        t = np.concatenate((t[idx:], t[:idx]))
+        p = np.concatenate((p[idx:], p[:idx]))
+    else:
+        t, p = t[:idx], p[:idx]
+    return t, p
+
+def get_power_range(power):
+    if len(power):
+        y_max = float(power.max())
+        padding = y_max * 0.2 if y_max > 0 else 100
+        return [0, y_max + padding]
+    return [0, 500]
+
+def create_chart(times, power):
+    # Timestamps are stored as datetime64 at insert time, so no copy/parse here
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['Datetime'], y=df['Power'], mode='lines',
-        line=dict(color='#00d4ff', width=3, shape='spline', smoothing=1.0),
+    fig.add_trace(go.Scattergl(
+        x=times, y=power, mode='lines',
+        line=dict(color='#00d4ff', width=3),
         fill='tozeroy', fillcolor='rgba(0, 212, 255, 0.15)',
         hovertemplate='<b>%{y:.0f} W</b><extra></extra>' 
     ))
 
-    if not df.empty:
-        y_max = df['Power'].max()
-        padding = y_max * 0.2 if y_max > 0 else 100
-        range_y = [0, y_max + padding]
-    else:
-        range_y = [0, 500]
+    range_y = get_power_range(power)
 
     fig.update_layout(
         paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
         margin=dict(l=10, r=0, t=10, b=20), height=250,
         xaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.05)', tickfont=dict(color='#666'), tickformat='%H:%M:%S'),
         yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.05)', tickfont=dict(color='#666'), range=range_y),
-        showlegend=False, hovermode="x unified",
+        showlegend=False, hovermode="x unified", uirevision='static',
         hoverlabel=dict(bgcolor="#111", font_size=12, font_family="Orbitron")
     )
     return fig
 
+def update_chart(fig, times, power):
+    # Swap the trace arrays in place instead of rebuilding the whole figure
+    with fig.batch_update():
+        fig.data[0].x = times
+        fig.data[0].y = power
+        fig.layout.yaxis.range = get_power_range(power)
+
+# Gauge figures are built once per session; each tick only patches the value
+if 'voltage_fig' not in st.session_state:
+    st.session_state.voltage_fig = create_gauge(0, "VOLTAGE (V)", 0, 300, "#00d4ff")
+    st.session_state.current_fig = create_gauge(0, "CURRENT (A)", 0, 30, "#ff0055")
+if 'chart_fig' not in st.session_state:
+    st.session_state.chart_fig = create_chart(*get_history_view())
+
 # --- 6. LAYOUT SKELETON ---
 header_col1, header_col2 = st.columns([4, 1])
 with header_col1:
@@ -232,8 +339,9 @@ with header_col2:
 st.markdown("<div style='height: 15px'></div>", unsafe_allow_html=True)
 
 # Metrics Row
-m1, m2, m3, m4 = st.columns(4)
-p_volts, p_amps, p_watts, p_cost = m1.empty(), m2.empty(), m3.empty(), m4.empty()
+metrics_placeholder = st.empty()
+# Placeholders are fresh on a full rerun, so forget what was last sent to them
+st.session_state.last_render = {}
 
 # Visuals Row
 c_left, c_mid, c_right = st.columns([1.5, 1.5, 2])
@@ -244,10 +352,42 @@ with c_right: console_placeholder = st.empty()
 st.markdown("<h5 style='margin-top:10px; color:#666;'>REAL-TIME POWER CONSUMPTION</h5>", unsafe_allow_html=True)
 chart_placeholder = st.empty()
 
-# --- 7. MAIN LOOP ---
-while True:
+# Flag a hidden browser tab in the URL (?tab=hidden) so the live fragment
+# can skip rendering while the dashboard is not being looked at. The flag is
+# removed again as soon as the tab is visible, so the URL stays clean.
+# A full run always renders, so drop a stale flag (reload/bookmark).
+if st.query_params.get('tab') == 'hidden':
+    del st.query_params['tab']
+components.html("""
+    <script>
+    const doc = window.parent.document;
+    const sync = () => {
+        const url = new URL(window.parent.location.href);
+        const hidden = doc.visibilityState === 'hidden';
+        if (hidden === (url.searchParams.get('tab') === 'hidden')) return;
+        if (hidden) url.searchParams.set('tab', 'hidden');
+        else url.searchParams.delete('tab');
+        window.parent.history.replaceState(window.parent.history.state, '', url);
+    };
+    doc.addEventListener('visibilitychange', sync);
+    // Don't leave a listener behind if Streamlit re-mounts this iframe
+    window.addEventListener('pagehide', () => doc.removeEventListener('visibilitychange', sync));
+    sync();
+    </script>
+""", height=0)
+
+# --- 7. LIVE UPDATE FRAGMENT ---
+# Only this fragment re-runs on each poll; page config, CSS, sidebar and
+# layout skeleton are left untouched between ticks.
+@st.fragment(run_every=refresh_rate)
+def tick():
     data = get_data()
-    now_str = datetime.now().strftime("%H:%M:%S")
+
+    # Tab hidden: get_data() keeps the energy total going, skip all rendering
+    if st.query_params.get('tab') == 'hidden':
+        return
+
+    now_str = time.strftime("%H:%M:%S")
 
     # Handle connection errors gracefully
     if data is None:
@@ -259,42 +399,39 @@ while True:
                 <br><span>Check ESP32 IP or WiFi...</span>
             </div>
         """, unsafe_allow_html=True)
-        time.sleep(2)
-        continue
+        return
 
     # Process Data
     cost = data['energy'] * tariff
     
     # Update History
-    new_row = pd.DataFrame({'Time': [now_str], 'Power': [data['power']]})
-    st.session_state.history = pd.concat([st.session_state.history, new_row], ignore_index=True).tail(50)
+    push_history(data['power'])
 
     # Render UI
     time_placeholder.markdown(f"<div style='text-align:right; font-family:Orbitron; color:#888; font-size:1.2rem;'>{now_str}</div>", unsafe_allow_html=True)
     
-    p_volts.markdown(get_hud_card_html("GRID VOLTAGE", f"{data['voltage']:.1f}", "V"), unsafe_allow_html=True)
-    p_amps.markdown(get_hud_card_html("CURRENT DRAW", f"{data['current']:.2f}", "A"), unsafe_allow_html=True)
-    p_watts.markdown(get_hud_card_html("ACTIVE POWER", f"{int(data['power'])}", "W"), unsafe_allow_html=True)
-    p_cost.markdown(get_hud_card_html("EST. COST", f"{cost:.2f}", "₹", is_cost=True), unsafe_allow_html=True)
+    # Skip the update when the displayed (rounded) values did not change
+    cards_html = render_all_cards(data['voltage'], data['current'], data['power'], cost)
+    last = st.session_state.last_render
+    if last.get('cards') != cards_html:
+        metrics_placeholder.markdown(cards_html, unsafe_allow_html=True)
+        last['cards'] = cards_html
 
-    gauge_v_placeholder.plotly_chart(create_gauge(data['voltage'], "VOLTAGE (V)", 0, 300, "#00d4ff"), use_container_width=True, config={'displayModeBar': False})
-    gauge_c_placeholder.plotly_chart(create_gauge(data['current'], "CURRENT (A)", 0, 30, "#ff0055"), use_container_width=True, config={'displayModeBar': False})
+    st.session_state.voltage_fig.data[0].update(value=data['voltage'])
+    st.session_state.current_fig.data[0].update(value=data['current'])
+    gauge_v_placeholder.plotly_chart(st.session_state.voltage_fig, use_container_width=True, config={'staticPlot': True, 'displayModeBar': False, 'responsive': False})
+    gauge_c_placeholder.plotly_chart(st.session_state.current_fig, use_container_width=True, config={'staticPlot': True, 'displayModeBar': False, 'responsive': False})
 
     # Diagnostic Logic
     v_status = "STABLE" if 200 < data['voltage'] < 250 else "WARN"
     v_col = "#0f0" if v_status == "STABLE" else "#fa0"
     
-    console_placeholder.markdown(f"""
-        <div class="console-box">
-            <div style="border-bottom: 1px solid #333; margin-bottom: 10px; color: #fff;">>> IOT_DIAGNOSTICS_LIVE</div>
-            <div class="console-line"><span>> SOURCE</span><span>{data.get('status', 'IOT')}</span></div>
-            <div class="console-line"><span>> GRID_FREQ</span><span>{data.get('freq', 50.0):.1f} Hz</span></div>
-            <div class="console-line"><span>> POWER_FACTOR</span><span>{data.get('pf', 0.9):.2f}</span></div>
-            <div class="console-line"><span>> VOLTAGE_STATUS</span><span style="color:{v_col}">[{v_status}]</span></div>
-            <div style="color:#666; font-size:0.7rem; margin-top:10px;">> PACKET_RX: {now_str}</div>
-        </div>
-    """, unsafe_allow_html=True)
+    console_placeholder.markdown(CONSOLE_TMPL.format(
+        status=data.get('status', 'IOT'), freq=data.get('freq', 50.0), pf=data.get('pf', 0.9),
+        v_col=v_col, v_status=v_status, now_str=now_str
+    ), unsafe_allow_html=True)
 
-    chart_placeholder.plotly_chart(create_chart(st.session_state.history), use_container_width=True, config={'displayModeBar': False})
-    
-    time.sleep(refresh_rate)
\ No newline at end of file
+    update_chart(st.session_state.chart_fig, *get_history_view())
+    chart_placeholder.plotly_chart(st.session_state.chart_fig, use_container_width=True, config={'displayModeBar': False})
+
+tick()